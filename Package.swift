@@ -110,6 +110,7 @@ let package = Package(
                 "Protos",
                 "update_protos.py",
                 "sync_status_codes.py",
+                "protos.manifest",
             ]
         ),
         // weird name, but whatever, internal targets
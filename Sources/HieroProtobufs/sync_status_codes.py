@@ -19,23 +19,41 @@ Options:
 
 import re
 import os
+import mmap
+import pickle
+import hashlib
+import json
 import sys
-import shutil
-import argparse
-from dataclasses import dataclass
-from typing import List, Dict, Optional, Tuple
+import tempfile
+from dataclasses import dataclass, field
+from contextlib import contextmanager
+from functools import lru_cache
+from operator import attrgetter
+from typing import List, Dict, Iterator, Optional, Tuple, Union
 
+# Slotted dataclasses need Python 3.10+; older interpreters fall back to regular ones
+_DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+
+@dataclass(**_DATACLASS_OPTIONS)
 class StatusCode:
     """Represents a status code from the proto file."""
     name: str           # e.g., "INVALID_TRANSACTION"
     code: int           # e.g., 1
     comment: str        # e.g., "For any error not handled by specific error codes listed below."
     deprecated: bool    # Whether the code is marked as deprecated
+    swift_name: str = field(init=False)  # e.g., "invalidTransaction"
+    doc_comment: str = field(init=False)  # Comment as written to Swift, e.g., "[Deprecated] ..."
+    
+    def __post_init__(self):
+        self.swift_name = proto_to_swift_case(self.name)
+        if self.deprecated:
+            self.doc_comment = f"[Deprecated] {self.comment}" if self.comment else "[Deprecated]"
+        else:
+            self.doc_comment = self.comment
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class SwiftStatusCode:
     """Represents a status code parsed from the Swift file."""
     swift_name: str     # e.g., "invalidTransaction"
@@ -46,6 +64,12 @@ class SwiftStatusCode:
     line_end: int       # Line number where case declaration ends
 
 
+# Parsed proto status codes are cached here, keyed by a hash of the proto and this script
+PROTO_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.proto_cache.pkl')
+
+# Hashes of the proto and Swift files from the last run that left them in sync
+SYNC_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.sync_cache.json')
+
 # Acronyms that need special casing in Swift
 # ID stays uppercase (e.g., invalidFileID), TX uses Title Case (e.g., insufficientTxFee)
 ACRONYM_MAPPINGS = {
@@ -59,6 +83,40 @@ ACRONYM_MAPPINGS = {
 }
 
 
+# Compiled patterns for parsing response_code.proto and Status.swift
+_ENUM_BLOCK_RE = re.compile(rb'enum\s+ResponseCodeEnum\s*\{(.*?)\}', re.DOTALL)
+_PROTO_TOKEN_RE = re.compile(b'|'.join([
+    rb'(?P<block>/\*\*?(?P<block_text>.*?)\*/)',
+    rb'(?P<line>//(?P<line_text>[^\n]*))',
+    rb'(?P<blank>\n[ \t\r]*\n)',
+    rb'(?P<enum>^[ \t]*(?P<name>\w+)\s*=\s*(?P<code>\d+)\s*(?:\[deprecated\s*=\s*true\])?\s*;'
+    rb'(?:[ \t]*//(?P<inline>[^\n]*))?)',
+]), re.DOTALL | re.MULTILINE)
+# Line breaks inside a block comment, including each following line's `*` margin
+_BLOCK_MARGIN_RE = re.compile(rb'(?:\s*\n[ \t]*\**[ \t]*)+')
+_SWIFT_INIT_RE = re.compile(r'case\s+(\d+):\s*self\s*=\s*\.(\w+)')
+_SWIFT_CASE_RE = re.compile(r'^\s*case\s+(\w+)\s*//\s*=\s*(\d+)')
+
+# Sections of Status.swift that receive generated code, keyed by anchor group name
+SWIFT_SECTION_NAMES = {
+    'case_declarations': "case declarations",
+    'init_cases': "init cases",
+    'raw_value_cases': "rawValue cases",
+    'all_cases': "allCases entries",
+    'name_map': "nameMap entries",
+}
+
+# New code for each section is inserted directly before the matching anchor
+_SWIFT_ANCHOR_RE = re.compile('|'.join([
+    r'(?P<case_declarations>    /// swift-format-ignore: AlwaysUseLowerCamelCase\n    case unrecognized\(Int32\))',
+    r'(?P<init_cases>        default: self = \.unrecognized\(rawValue\))',
+    r'(?P<raw_value_cases>        case \.unrecognized\(let i\): return i)',
+    r'(?P<all_cases>    \]\n\}(?=\n\n// minimal edit from proto-generated file:))',
+    r'(?P<name_map>        \]\n\}(?=\n\nextension Status: Sendable))',
+]))
+
+
+@lru_cache(maxsize=None)
 def proto_to_swift_case(proto_name: str) -> str:
     """
     Convert PROTO_SNAKE_CASE to swiftCamelCase.
@@ -72,152 +130,155 @@ def proto_to_swift_case(proto_name: str) -> str:
     if proto_name == "OK":
         return "ok"
     
-    parts = proto_name.split('_')
-    result_parts = [parts[0].lower()]
+    first, separator, rest = proto_name.partition('_')
+    if not separator:
+        return first.lower()
     
-    for part in parts[1:]:
-        result_parts.append(ACRONYM_MAPPINGS.get(part, part.capitalize()))
-    
-    return ''.join(result_parts)
-
-
-def _extract_block_comment_text(line: str) -> str:
-    """Extract text from a single-line block comment."""
-    return re.sub(r'/\*\*?\s*|\s*\*/', '', line).strip()
+    # Acronyms are mapped per part, before joining loses the part boundaries
+    return first.lower() + ''.join(ACRONYM_MAPPINGS.get(part, part.capitalize()) for part in rest.split('_'))
 
 
-def _process_comment_line(line: str, current_comment: List[str]) -> bool:
-    """Process a comment line and return True if it was a comment."""
-    # Block comment start
-    if line.startswith('/*'):
-        current_comment.clear()
-        comment_text = _extract_block_comment_text(line) if '*/' in line else ''
-        if comment_text:
-            current_comment.append(comment_text)
-        return True
-    
-    # Inside block comment
-    if line.startswith('*'):
-        comment_text = line.lstrip('* ').rstrip()
-        is_valid = comment_text and comment_text != '/'
-        if is_valid:
-            current_comment.append(comment_text)
-        return True
-    
-    # Single line comment
-    if line.startswith('//'):
-        current_comment.append(line.lstrip('/ ').strip())
-        return True
-    
-    return False
+@contextmanager
+def _map_file(path: str) -> Iterator[Union[mmap.mmap, bytes]]:
+    """Map a file read-only so regexes scan the page cache without a decoded copy."""
+    with open(path, 'rb') as f:
+        # mmap rejects empty files
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
 
 
-def _parse_enum_value(line: str, current_comment: List[str]) -> Optional[StatusCode]:
-    """Parse an enum value line and return StatusCode if matched."""
-    enum_pattern = r'^(\w+)\s*=\s*(\d+)\s*(?:\[deprecated\s*=\s*true\])?\s*;?\s*(?://\s*(.*))?$'
-    match = re.match(enum_pattern, line)
-    
-    if not match:
-        return None
-    
-    name = match.group(1)
-    code = int(match.group(2))
-    inline_comment = match.group(3)
-    deprecated = 'deprecated' in line.lower()
-    
-    comment = ' '.join(current_comment)
-    if inline_comment:
-        comment = f"{comment} {inline_comment}".strip() if comment else inline_comment
-    
-    return StatusCode(name=name, code=code, comment=comment.strip(), deprecated=deprecated)
+def _clean_block_comment(block_text: bytes) -> str:
+    """Fold a block comment body into a single line of text."""
+    # Single-line comments only need their delimiters' leftovers trimmed, no regex pass
+    if b'\n' in block_text:
+        block_text = _BLOCK_MARGIN_RE.sub(b' ', block_text)
+    return block_text.decode('utf-8').strip().removeprefix('*').strip()
 
 
-def parse_proto_file(proto_path: str, verbose: bool = False) -> List[StatusCode]:
-    """Parse response_code.proto to extract all status codes."""
-    if verbose:
-        print(f"Reading proto file: {proto_path}")
-    
-    with open(proto_path, 'r') as f:
-        content = f.read()
-    
-    enum_match = re.search(r'enum\s+ResponseCodeEnum\s*\{(.*?)\}', content, re.DOTALL)
+def _parse_proto_content(content: Union[mmap.mmap, bytes]) -> List[StatusCode]:
+    """Extract all status codes from the raw contents of response_code.proto."""
+    enum_match = _ENUM_BLOCK_RE.search(content)
     if not enum_match:
         print("Error: Could not find ResponseCodeEnum in proto file")
         return []
     
     codes = []
-    current_comment: List[str] = []
+    comment_lines: List[str] = []
     
-    for line in enum_match.group(1).split('\n'):
-        line = line.strip()
+    # One scan over the enum body yields comments, blank lines and values in order;
+    # only the captured text is decoded
+    for match in _PROTO_TOKEN_RE.finditer(content, enum_match.start(1), enum_match.end(1)):
+        kind = match.lastgroup
         
-        if not line:
-            current_comment.clear()
+        if kind == 'line':
+            line_text = match.group('line_text').decode('utf-8').removeprefix('/').strip()
+            if line_text:
+                comment_lines.append(line_text)
             continue
         
-        if _process_comment_line(line, current_comment):
+        if kind == 'enum':
+            inline_comment = match.group('inline')
+            if inline_comment and inline_comment.strip():
+                comment_lines.append(inline_comment.decode('utf-8').strip())
+            
+            codes.append(StatusCode(
+                name=match.group('name').decode('ascii'),
+                code=int(match.group('code')),
+                comment=' '.join(comment_lines).strip(),
+                deprecated=b'deprecated' in match.group(0).lower()
+            ))
+            comment_lines.clear()
             continue
         
-        status_code = _parse_enum_value(line, current_comment)
-        if status_code:
-            codes.append(status_code)
-            current_comment.clear()
-    
-    if verbose:
-        print(f"Found {len(codes)} status codes in proto file")
+        # A blank line detaches, and a block comment replaces, anything collected before it
+        comment_lines.clear()
+        if kind == 'block':
+            block_text = _clean_block_comment(match.group('block_text'))
+            if block_text:
+                comment_lines.append(block_text)
     
     return codes
 
 
-def parse_swift_status_codes(swift_path: str, verbose: bool = False) -> Dict[int, str]:
-    """Parse Status.swift to find existing status codes (code -> swift_name mapping)."""
+@lru_cache(maxsize=None)
+def _script_sha256() -> str:
+    """Return the hex SHA-256 digest of this script, so caches are invalidated when it changes."""
+    return _file_sha256(__file__)
+
+
+def _proto_cache_key(proto_data: Union[mmap.mmap, bytes]) -> bytes:
+    """Hash the proto contents together with this script, so parser changes invalidate the cache."""
+    digest = hashlib.sha256(proto_data)
+    digest.update(_script_sha256().encode())
+    return digest.digest()
+
+
+def _load_proto_cache(cache_key: bytes) -> Optional[List[StatusCode]]:
+    """Return the cached status codes if the cache was built from the same inputs."""
+    try:
+        with open(PROTO_CACHE_PATH, 'rb') as f:
+            stored_key, codes = pickle.load(f)
+    except Exception:
+        # Missing, stale-format or unreadable caches are simply rebuilt
+        return None
+    return codes if stored_key == cache_key else None
+
+
+def _store_proto_cache(cache_key: bytes, codes: List[StatusCode]) -> None:
+    """Persist parsed status codes; a failed write only costs a re-parse next run."""
+    try:
+        with open(PROTO_CACHE_PATH, 'wb') as f:
+            pickle.dump((cache_key, codes), f)
+    except (OSError, pickle.PicklingError) as e:
+        print(f"Warning: Could not write proto cache: {e}")
+
+
+def parse_proto_file(proto_path: str, verbose: bool = False) -> List[StatusCode]:
+    """Parse response_code.proto to extract all status codes."""
     if verbose:
-        print(f"Reading Swift file: {swift_path}")
-    
-    with open(swift_path, 'r') as f:
-        content = f.read()
-    
-    codes = {}
-    init_pattern = r'case\s+(\d+):\s*self\s*=\s*\.(\w+)'
+        print(f"Reading proto file: {proto_path}")
     
-    for match in re.finditer(init_pattern, content):
-        codes[int(match.group(1))] = match.group(2)
+    with _map_file(proto_path) as proto_data:
+        cache_key = _proto_cache_key(proto_data)
+        codes = _load_proto_cache(cache_key)
+        
+        if codes is not None:
+            if verbose:
+                print(f"Using cached parse from {PROTO_CACHE_PATH}")
+        else:
+            codes = _parse_proto_content(proto_data)
+            if codes:
+                _store_proto_cache(cache_key, codes)
     
     if verbose:
-        print(f"Found {len(codes)} status codes in Swift file")
+        print(f"Found {len(codes)} status codes in proto file")
     
     return codes
 
 
-def _extract_doc_comment(lines: List[str], case_line_idx: int) -> Tuple[List[str], int]:
-    """Extract doc comment lines preceding a case declaration."""
-    comment_lines = []
-    comment_start = case_line_idx
-    j = case_line_idx - 1
-    
-    while j >= 0:
-        prev_line = lines[j].strip()
-        if prev_line.startswith('///'):
-            comment_lines.insert(0, prev_line[3:].strip())
-            comment_start = j
-            j -= 1
-        elif prev_line == '' or prev_line.startswith('case '):
-            break
-        else:
-            break
+def _parse_swift_init_cases(content: str) -> Dict[int, str]:
+    """Find existing status codes (code -> swift_name mapping) in Status.swift content."""
+    # The cases all live in init(rawValue:), so only scan that block when it can be found
+    start = content.find('init(rawValue:')
+    end = content.find('default: self = .unrecognized', start) if start != -1 else -1
+    if end == -1:
+        start, end = 0, len(content)
     
-    return comment_lines, comment_start
+    return {int(match.group(1)): match.group(2) for match in _SWIFT_INIT_RE.finditer(content, start, end)}
 
 
-def _parse_swift_case_comment(lines: List[str], match: re.Match, line_idx: int) -> SwiftStatusCode:
-    """Parse a Swift case declaration and its associated comment."""
+def _parse_swift_case_comment(match: re.Match, comment_lines: List[str],
+                              comment_start: int, line_idx: int) -> SwiftStatusCode:
+    """Parse a Swift case declaration and the doc comment lines directly above it."""
     swift_name = match.group(1)
     code = int(match.group(2))
     
-    comment_lines, comment_start = _extract_doc_comment(lines, line_idx)
     full_comment = ' '.join(comment_lines)
     deprecated = full_comment.startswith('[Deprecated]')
-    clean_comment = full_comment[len('[Deprecated]'):].strip() if deprecated else full_comment
+    clean_comment = full_comment.removeprefix('[Deprecated]').strip()
     
     return SwiftStatusCode(
         swift_name=swift_name,
@@ -229,93 +290,123 @@ def _parse_swift_case_comment(lines: List[str], match: re.Match, line_idx: int)
     )
 
 
-def parse_swift_comments(swift_path: str, verbose: bool = False) -> Dict[int, SwiftStatusCode]:
-    """Parse Status.swift to extract comments for each status code."""
-    with open(swift_path, 'r') as f:
-        lines = f.readlines()
-    
+def _parse_swift_case_comments(lines: List[str]) -> Dict[int, SwiftStatusCode]:
+    """Extract the comment for each status code from the lines of Status.swift."""
     codes: Dict[int, SwiftStatusCode] = {}
-    case_pattern = r'^\s*case\s+(\w+)\s*//\s*=\s*(\d+)'
+    comment_lines: List[str] = []
+    comment_start = 0
     
+    # Single forward pass: collect each run of `///` lines and attach it to the case that follows
     for i, line in enumerate(lines):
-        match = re.match(case_pattern, line)
-        if match:
-            swift_code = _parse_swift_case_comment(lines, match, i)
-            codes[swift_code.code] = swift_code
+        stripped = line.strip()
+        
+        if stripped.startswith('///'):
+            if not comment_lines:
+                comment_start = i
+            comment_lines.append(stripped[3:].strip())
+            continue
+        
+        if stripped.startswith('case'):
+            match = _SWIFT_CASE_RE.match(line)
+            if match:
+                swift_code = _parse_swift_case_comment(
+                    match, comment_lines, comment_start if comment_lines else i, i)
+                codes[swift_code.code] = swift_code
+        
+        comment_lines.clear()
+    
+    return codes
+
+
+def parse_swift(swift_path: str,
+                verbose: bool = False) -> Tuple[str, Dict[int, str], Dict[int, SwiftStatusCode]]:
+    """Read Status.swift once and parse both its status codes and their comments.
+    
+    The raw content is returned too, so updates can be applied without reading the file again.
+    """
+    if verbose:
+        print(f"Reading Swift file: {swift_path}")
+    
+    with open(swift_path, 'r') as f:
+        content = f.read()
     
+    codes = _parse_swift_init_cases(content)
     if verbose:
-        print(f"Parsed comments for {len(codes)} status codes")
+        print(f"Found {len(codes)} status codes in Swift file")
     
-    return codes
+    comments = _parse_swift_case_comments(content.splitlines())
+    if verbose:
+        print(f"Parsed comments for {len(comments)} status codes")
+    
+    return content, codes, comments
 
 
-def find_comment_updates(proto_codes: List[StatusCode], 
-                         swift_comments: Dict[int, SwiftStatusCode],
-                         verbose: bool = False) -> List[Tuple[StatusCode, SwiftStatusCode]]:
-    """Find status codes that need comment or deprecated status updates."""
+def diff_codes(proto_codes: List[StatusCode], swift_codes: Dict[int, str],
+               swift_comments: Dict[int, SwiftStatusCode],
+               verbose: bool = False) -> Tuple[List[StatusCode], List[Tuple[StatusCode, SwiftStatusCode]]]:
+    """
+    Compare proto status codes against Status.swift in a single pass.
+    
+    Returns the codes missing from Swift (sorted by code) and the existing codes whose
+    comment or deprecated status needs updating.
+    """
+    missing = []
     updates = []
     
     for proto_code in proto_codes:
-        if proto_code.code not in swift_comments:
-            continue
-        
-        swift_code = swift_comments[proto_code.code]
+        if proto_code.code not in swift_codes:
+            missing.append(proto_code)
         
-        # Check if comment differs
-        proto_comment = proto_code.comment.strip()
-        swift_comment = swift_code.comment.strip()
+        swift_code = swift_comments.get(proto_code.code)
+        if swift_code is None:
+            continue
         
-        comment_differs = proto_comment != swift_comment
+        # Both comments are stripped when parsed
+        comment_differs = proto_code.comment != swift_code.comment
         deprecated_differs = proto_code.deprecated != swift_code.deprecated
         
         if comment_differs or deprecated_differs:
             if verbose:
                 if comment_differs:
                     print(f"  Comment differs for {proto_code.code}:")
-                    print(f"    Proto: {proto_comment[:60]}...")
-                    print(f"    Swift: {swift_comment[:60]}...")
+                    print(f"    Proto: {proto_code.comment[:60]}...")
+                    print(f"    Swift: {swift_code.comment[:60]}...")
                 if deprecated_differs:
                     print(f"  Deprecated status differs for {proto_code.code}: "
                           f"proto={proto_code.deprecated}, swift={swift_code.deprecated}")
             updates.append((proto_code, swift_code))
     
-    return updates
-
-
-def find_missing_codes(proto_codes: List[StatusCode], swift_codes: Dict[int, str]) -> List[StatusCode]:
-    """Find status codes that are in proto but not in Swift."""
-    missing = [pc for pc in proto_codes if pc.code not in swift_codes]
-    return sorted(missing, key=lambda x: x.code)
+    # Proto enums are normally declared in code order, so only sort when needed
+    if not all(a.code <= b.code for a, b in zip(missing, missing[1:])):
+        missing.sort(key=attrgetter('code'))
+    
+    return missing, updates
 
 
 def generate_case_declaration(status: StatusCode) -> str:
     """Generate Swift enum case declaration with doc comment."""
-    swift_name = proto_to_swift_case(status.name)
     lines = []
     
-    if status.comment:
-        comment = f"[Deprecated] {status.comment}" if status.deprecated else status.comment
-        lines.append(f"    /// {comment}")
-    elif status.deprecated:
-        lines.append("    /// [Deprecated]")
+    if status.doc_comment:
+        lines.append(f"    /// {status.doc_comment}")
     
-    lines.append(f"    case {swift_name}  // = {status.code}")
+    lines.append(f"    case {status.swift_name}  // = {status.code}")
     return '\n'.join(lines)
 
 
 def generate_init_case(status: StatusCode) -> str:
     """Generate init(rawValue:) case line."""
-    return f"        case {status.code}: self = .{proto_to_swift_case(status.name)}"
+    return f"        case {status.code}: self = .{status.swift_name}"
 
 
 def generate_raw_value_case(status: StatusCode) -> str:
     """Generate rawValue property case line."""
-    return f"        case .{proto_to_swift_case(status.name)}: return {status.code}"
+    return f"        case .{status.swift_name}: return {status.code}"
 
 
 def generate_all_cases_entry(status: StatusCode) -> str:
     """Generate allCases array entry."""
-    return f"        .{proto_to_swift_case(status.name)},"
+    return f"        .{status.swift_name},"
 
 
 def generate_name_map_entry(status: StatusCode) -> str:
@@ -323,24 +414,30 @@ def generate_name_map_entry(status: StatusCode) -> str:
     return f'            {status.code}: "{status.name}",'
 
 
-def _insert_before_marker(content: str, marker: str, new_content: str, section_name: str) -> str:
-    """Insert new content before a marker in the file content."""
-    if marker in content:
-        return content.replace(marker, new_content + '\n' + marker)
-    print(f"Warning: Could not find insertion point for {section_name}")
-    return content
-
-
-def _insert_before_pattern(content: str, pattern: str, new_content: str, 
-                           replacement_suffix: str, section_name: str) -> str:
-    """Insert new content before a regex pattern match."""
-    match = re.search(pattern, content)
-    if match:
-        old_ending = match.group(0)
-        new_ending = new_content + replacement_suffix
-        return content.replace(old_ending, new_ending)
-    print(f"Warning: Could not find insertion point for {section_name}")
-    return content
+def _insert_before_anchors(content: str, insertions: Dict[str, str]) -> Tuple[str, List[str]]:
+    """
+    Insert each section's new content before its anchor in a single pass over the file content.
+    
+    Returns the updated content and the names of any sections whose anchor was not found.
+    """
+    parts = []
+    found = set()
+    prev_end = 0
+    
+    for match in _SWIFT_ANCHOR_RE.finditer(content):
+        section = match.lastgroup
+        parts.append(content[prev_end:match.start()])
+        parts.append(insertions[section] + '\n')
+        prev_end = match.start()
+        found.add(section)
+    
+    parts.append(content[prev_end:])
+    
+    missing_sections = [name for section, name in SWIFT_SECTION_NAMES.items() if section not in found]
+    for section_name in missing_sections:
+        print(f"Warning: Could not find insertion point for {section_name}")
+    
+    return ''.join(parts), missing_sections
 
 
 def _log_verbose(verbose: bool, message: str) -> None:
@@ -349,114 +446,81 @@ def _log_verbose(verbose: bool, message: str) -> None:
         print(message)
 
 
-def _apply_swift_updates(content: str, missing_codes: List[StatusCode], verbose: bool) -> str:
-    """Apply all Swift file updates and return modified content."""
-    # 1. Add enum case declarations
-    _log_verbose(verbose, "Adding enum case declarations...")
-    case_declarations = '\n\n'.join(generate_case_declaration(c) for c in missing_codes)
-    marker = "    /// swift-format-ignore: AlwaysUseLowerCamelCase\n    case unrecognized(Int32)"
-    content = _insert_before_marker(content, marker, case_declarations + '\n', "case declarations")
-    
-    # 2. Add init(rawValue:) cases
-    _log_verbose(verbose, "Adding init(rawValue:) cases...")
-    init_cases = '\n'.join(generate_init_case(c) for c in missing_codes)
-    content = _insert_before_marker(content, "        default: self = .unrecognized(rawValue)", 
-                                    init_cases, "init cases")
-    
-    # 3. Add rawValue cases
-    _log_verbose(verbose, "Adding rawValue cases...")
-    raw_value_cases = '\n'.join(generate_raw_value_case(c) for c in missing_codes)
-    content = _insert_before_marker(content, "        case .unrecognized(let i): return i",
-                                    raw_value_cases, "rawValue cases")
-    
-    # 4. Add allCases entries
-    _log_verbose(verbose, "Adding allCases entries...")
-    all_cases_entries = '\n'.join(generate_all_cases_entry(c) for c in missing_codes)
-    content = _insert_before_pattern(
-        content,
-        r'(    \]\n\})\n\n// minimal edit from proto-generated file:',
-        all_cases_entries,
-        '\n    ]\n}\n\n// minimal edit from proto-generated file:',
-        "allCases entries"
-    )
+def _apply_swift_updates(content: str, missing_codes: List[StatusCode],
+                         verbose: bool) -> Tuple[str, List[str]]:
+    """Apply all Swift file updates and return modified content and any sections left unchanged."""
+    _log_verbose(verbose, f"Adding {', '.join(SWIFT_SECTION_NAMES.values())}...")
     
-    # 5. Add nameMap entries
-    _log_verbose(verbose, "Adding nameMap entries...")
-    name_map_entries = '\n'.join(generate_name_map_entry(c) for c in missing_codes)
-    content = _insert_before_pattern(
-        content,
-        r'(        \]\n\})\n\nextension Status: Sendable',
-        name_map_entries,
-        '\n        ]\n}\n\nextension Status: Sendable',
-        "nameMap entries"
-    )
+    # Build every section in one pass over the missing codes
+    case_declarations, init_cases, raw_value_cases, all_cases_entries, name_map_entries = [], [], [], [], []
+    for code in missing_codes:
+        case_declarations.append(generate_case_declaration(code))
+        init_cases.append(generate_init_case(code))
+        raw_value_cases.append(generate_raw_value_case(code))
+        all_cases_entries.append(generate_all_cases_entry(code))
+        name_map_entries.append(generate_name_map_entry(code))
     
-    return content
+    return _insert_before_anchors(content, {
+        'case_declarations': '\n\n'.join(case_declarations) + '\n',
+        'init_cases': '\n'.join(init_cases),
+        'raw_value_cases': '\n'.join(raw_value_cases),
+        'all_cases': '\n'.join(all_cases_entries),
+        'name_map': '\n'.join(name_map_entries),
+    })
 
 
 def _apply_comment_updates(content: str, updates: List[Tuple[StatusCode, SwiftStatusCode]], 
                            verbose: bool) -> str:
     """Update comments for existing status codes."""
-    lines = content.split('\n')
-    
-    # Sort updates by line number in reverse order to avoid index shifting
-    sorted_updates = sorted(updates, key=lambda x: x[1].line_start, reverse=True)
+    # Lines keep their endings, so untouched lines are copied and joined without separators
+    lines = content.splitlines(keepends=True)
+    new_lines: List[str] = []
+    copied_up_to = 0
     
-    for proto_code, swift_code in sorted_updates:
+    # Walk the updates top to bottom, copying untouched lines between them once
+    for proto_code, swift_code in sorted(updates, key=lambda x: x[1].line_start):
         _log_verbose(verbose, f"Updating comment for {swift_code.swift_name} (code {proto_code.code})")
         
-        # Build new comment
-        if proto_code.comment:
-            if proto_code.deprecated:
-                new_comment = f"    /// [Deprecated] {proto_code.comment}"
-            else:
-                new_comment = f"    /// {proto_code.comment}"
-        elif proto_code.deprecated:
-            new_comment = "    /// [Deprecated]"
-        else:
-            new_comment = None
-        
-        # Find the case line
-        case_line_idx = swift_code.line_end
+        new_comment = f"    /// {proto_code.doc_comment}" if proto_code.doc_comment else None
         
-        # Remove old comment lines (from line_start to line before case)
-        if swift_code.line_start < swift_code.line_end:
-            # There are comment lines to remove
-            del lines[swift_code.line_start:swift_code.line_end]
-            case_line_idx = swift_code.line_start
-        
-        # Insert new comment before case line
+        # Keep everything before the old comment, then skip the old comment lines
+        new_lines.extend(lines[copied_up_to:swift_code.line_start])
         if new_comment:
-            lines.insert(case_line_idx, new_comment)
+            new_lines.append(new_comment + '\n')
+        copied_up_to = swift_code.line_end
     
-    return '\n'.join(lines)
+    new_lines.extend(lines[copied_up_to:])
+    return ''.join(new_lines)
 
 
-def _write_file_with_backup(swift_path: str, content: str, verbose: bool) -> bool:
-    """Write content to file with backup/restore on failure."""
-    backup_path = swift_path + '.bak'
-    if verbose:
-        print(f"Creating backup at {backup_path}")
-    shutil.copy2(swift_path, backup_path)
+def _write_file_atomically(swift_path: str, content: str, verbose: bool) -> bool:
+    """Write content to a sibling temp file and atomically swap it into place."""
+    tmp_path = None
     
     try:
-        with open(swift_path, 'w') as f:
+        # A uniquely named temp file in the same directory, so os.replace stays a same-filesystem rename
+        with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(swift_path),
+                                         prefix=f'.{os.path.basename(swift_path)}.', suffix='.tmp',
+                                         delete=False) as f:
+            tmp_path = f.name
+            if verbose:
+                print(f"Writing updated content to {tmp_path}")
             f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, os.stat(swift_path).st_mode & 0o7777)
+        os.replace(tmp_path, swift_path)
         if verbose:
             print("Successfully wrote updated Status.swift")
-        os.remove(backup_path)
-        if verbose:
-            print("Removed backup file")
         return True
     except Exception as e:
         print(f"Error writing file: {e}")
-        print("Restoring from backup...")
-        shutil.copy2(backup_path, swift_path)
-        os.remove(backup_path)
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
         return False
 
 
-def update_swift_file(swift_path: str, missing_codes: List[StatusCode],
+def update_swift_file(swift_path: str, content: str, missing_codes: List[StatusCode],
                       comment_updates: List[Tuple[StatusCode, SwiftStatusCode]],
                       dry_run: bool = False, verbose: bool = False) -> bool:
     """Update Status.swift with missing status codes and comment updates."""
@@ -464,17 +528,7 @@ def update_swift_file(swift_path: str, missing_codes: List[StatusCode],
         print("No updates needed.")
         return True
     
-    with open(swift_path, 'r') as f:
-        content = f.read()
-    
-    # Apply comment updates first (before adding new codes changes line numbers)
-    if comment_updates:
-        content = _apply_comment_updates(content, comment_updates, verbose)
-    
-    # Then apply missing codes
-    if missing_codes:
-        content = _apply_swift_updates(content, missing_codes, verbose)
-    
+    # A dry run only reports counts, so skip rewriting the content entirely
     if dry_run:
         print("\n[DRY RUN] Would update Status.swift with the following changes:")
         if missing_codes:
@@ -483,7 +537,19 @@ def update_swift_file(swift_path: str, missing_codes: List[StatusCode],
             print(f"  - Update {len(comment_updates)} comment(s)/deprecated status(es)")
         return True
     
-    return _write_file_with_backup(swift_path, content, verbose)
+    # Apply comment updates first (before adding new codes changes line numbers)
+    if comment_updates:
+        content = _apply_comment_updates(content, comment_updates, verbose)
+    
+    # Then apply missing codes
+    if missing_codes:
+        content, missing_sections = _apply_swift_updates(content, missing_codes, verbose)
+        # A partially updated Status.swift doesn't compile, so don't write one
+        if missing_sections:
+            print("Error: Status.swift was not modified because some insertion points are missing")
+            return False
+    
+    return _write_file_atomically(swift_path, content, verbose)
 
 
 def _get_file_paths() -> Tuple[str, str]:
@@ -504,13 +570,54 @@ def _validate_files(proto_path: str, swift_path: str) -> None:
         sys.exit(1)
 
 
+def _file_sha256(path: str) -> str:
+    """Return the hex SHA-256 digest of a file's contents."""
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):  # Python 3.11+
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _sync_hashes(proto_path: str, swift_path: str) -> Dict[str, str]:
+    """
+    Hash the proto and Swift files; content hashes survive git checkouts that reset mtimes.
+    
+    The script is hashed too, so changes to parsing or generation force a fresh comparison.
+    """
+    return {
+        'proto': _file_sha256(proto_path),
+        'swift': _file_sha256(swift_path),
+        'script': _script_sha256(),
+    }
+
+
+def _is_up_to_date(proto_path: str, swift_path: str) -> bool:
+    """Check whether both files are unchanged since they were last found in sync."""
+    try:
+        with open(SYNC_CACHE_PATH, 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return cached == _sync_hashes(proto_path, swift_path)
+
+
+def _write_sync_cache(proto_path: str, swift_path: str) -> None:
+    """Record the hashes of a proto and Swift file pair that is in sync."""
+    try:
+        with open(SYNC_CACHE_PATH, 'w') as f:
+            json.dump(_sync_hashes(proto_path, swift_path), f, indent=2)
+            f.write('\n')
+    except OSError as e:
+        print(f"Warning: Could not write sync cache: {e}")
+
+
 def _report_changes(missing: List[StatusCode], 
                     comment_updates: List[Tuple[StatusCode, SwiftStatusCode]]) -> None:
     """Print report of changes to be made."""
     if missing:
         print(f"Found {len(missing)} missing status code(s):")
         for code in missing:
-            print(f"  - {proto_to_swift_case(code.name)} ({code.code})")
+            print(f"  - {code.swift_name} ({code.code})")
         print()
     if comment_updates:
         print(f"Found {len(comment_updates)} comment/deprecated update(s):")
@@ -535,6 +642,9 @@ def _print_success(missing: List[StatusCode],
 
 
 def main():
+    # Imported here so importing this module for its helpers doesn't pay for CLI parsing
+    import argparse
+    
     parser = argparse.ArgumentParser(description='Synchronize Status.swift with response_code.proto')
     parser.add_argument('--dry-run', action='store_true', help='Preview changes without modifying files')
     parser.add_argument('--verbose', '-v', action='store_true', help='Show detailed output')
@@ -549,25 +659,31 @@ def main():
     
     _validate_files(proto_path, swift_path)
     
+    if _is_up_to_date(proto_path, swift_path):
+        print("✓ Status.swift is in sync with response_code.proto (unchanged since last sync)\nNo updates needed.")
+        sys.exit(0)
+    
     proto_codes = parse_proto_file(proto_path, args.verbose)
-    swift_codes = parse_swift_status_codes(swift_path, args.verbose)
-    swift_comments = parse_swift_comments(swift_path, args.verbose)
+    swift_content, swift_codes, swift_comments = parse_swift(swift_path, args.verbose)
     
     print(f"Proto file: {len(proto_codes)} status codes")
     print(f"Swift file: {len(swift_codes)} status codes\n")
     
-    missing = find_missing_codes(proto_codes, swift_codes)
-    comment_updates = find_comment_updates(proto_codes, swift_comments, args.verbose)
+    missing, comment_updates = diff_codes(proto_codes, swift_codes, swift_comments, args.verbose)
     
     if not missing and not comment_updates:
         print("✓ Status.swift is in sync with response_code.proto\nNo updates needed.")
+        _write_sync_cache(proto_path, swift_path)
         sys.exit(0)
     
     _report_changes(missing, comment_updates)
     
-    success = update_swift_file(swift_path, missing, comment_updates, args.dry_run, args.verbose)
+    success = update_swift_file(swift_path, swift_content, missing, comment_updates,
+                                args.dry_run, args.verbose)
     
     if success:
+        if not args.dry_run:
+            _write_sync_cache(proto_path, swift_path)
         _print_success(missing, comment_updates, args.dry_run)
         sys.exit(0)
     
@@ -1,14 +1,46 @@
 import subprocess
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 import os
 import shutil
 from pathlib import Path
 import glob
 import shlex
 from subprocess import CompletedProcess
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum, auto
 import argparse
 import re
+import hashlib
+import json
+import filecmp
+import tempfile
+
+# Hashes of the vendored protos and protoc options from the last successful generation
+PROTOC_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.protoc_cache.json')
+
+GENERATED_DIR = "./Generated"
+
+# List of the proto files to vendor and generate, one path per line
+PROTOS_MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'protos.manifest')
+
+# Worker threads for per-file I/O such as copying and hashing protos
+IO_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Output directories are added per run, since protoc writes into a staging directory first
+PROTOBUF_OPTIONS = [
+    "--swift_opt=Visibility=Public",
+    "--swift_opt=FileNaming=FullPath",
+]
+
+GRPC_OPTIONS = [
+    "--grpc-swift_opt=Visibility=Public",
+]
+
+# Pattern to match hieroVersion: vX.X.X in the CI workflow
+HIERO_VERSION_PATTERN = re.compile(r'(hieroVersion:\s*)v[\d.]+')
+
+# Pattern to match the path of each import statement in a proto file
+PROTO_IMPORT_PATTERN = re.compile(r'^\s*import\s+(?:public\s+|weak\s+)?"([^"]+)"\s*;', re.MULTILINE)
 
 class ProtoDirectory(Enum):
     MIRROR: str = "Mirror"
@@ -20,22 +52,69 @@ class ProtoDirectory(Enum):
     def __str__(self):
         return self.value
 
+def iter_files(directory: str) -> Iterator[os.DirEntry]:
+    """
+    Recursively yield the files under a directory, using the file types readdir
+    already reported instead of a stat per entry. Like os.walk, a directory's own
+    files are yielded before those of its subdirectories.
+    """
+    subdirectories = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            elif entry.is_file():
+                yield entry
+    for subdirectory in subdirectories:
+        yield from iter_files(subdirectory)
+
 def find_proto_file(filename: str, search_dir: str) -> str:
     """
     Search for a proto file in the source directory and its subdirectories.
     Returns the full path if found, empty string if not found.
     """
-    for root, _, files in os.walk(search_dir):
-        if filename in files:
-            return os.path.join(root, filename)
+    for entry in iter_files(search_dir):
+        if entry.name == filename:
+            return entry.path
     return ""
 
+def load_proto_manifest(manifest_path: str) -> List[str]:
+    """
+    Read the proto file list from the manifest, skipping blank lines and # comments.
+    """
+    with open(manifest_path, 'r') as f:
+        stripped_lines = (line.strip() for line in f)
+        return [line for line in stripped_lines if line and not line.startswith('#')]
+
 def ensure_directory_exists(directory: str):
     Path(directory).mkdir(parents=True, exist_ok=True)
 
+def copy_proto_file(source_base: str, dest_base: str, proto_file: str) -> Tuple[bool, str]:
+    """
+    Copy a single proto file into the destination tree.
+    Returns whether the copy succeeded and the message to report for it.
+    """
+    # Construct source and destination paths
+    source_file = os.path.join(source_base, proto_file)
+    dest_file = os.path.join(dest_base, proto_file)
+    
+    # Skip if source file doesn't exist
+    if not os.path.exists(source_file):
+        return False, f"Warning: Source file not found: {source_file}"
+    
+    try:
+        # Copy only the contents; the protoc cache is keyed on hashes, so metadata is not needed
+        shutil.copyfile(source_file, dest_file)
+        return True, f"Copied: {proto_file}"
+    except Exception as e:
+        return False, f"Error copying {proto_file}: {e}"
+
 def organize_proto_files(source_base: str, dest_base: str, proto_files: List[str]):
     print("\nOrganizing .proto files")
     
+    # Drop duplicate entries (keeping the first), so no file is copied or passed to protoc twice
+    proto_files = list(dict.fromkeys(proto_files))
+    
     # Track which files were successfully copied
     copied_files = []
     
@@ -43,86 +122,194 @@ def organize_proto_files(source_base: str, dest_base: str, proto_files: List[str
         # Create destination directory if it doesn't exist
         os.makedirs(dest_base, exist_ok=True)
         
-        # Process each file in the files_to_generate list
-        for proto_file in proto_files:
-            # Construct source and destination paths
-            source_file = os.path.join(source_base, proto_file)
-            dest_file = os.path.join(dest_base, proto_file)
-            
-            # Skip if source file doesn't exist
-            if not os.path.exists(source_file):
-                print(f"Warning: Source file not found: {source_file}")
-                continue
-                
-            # Create subdirectories if needed
-            os.makedirs(os.path.dirname(dest_file), exist_ok=True)
-            
-            # Copy the file
-            try:
-                shutil.copy2(source_file, dest_file)
-                copied_files.append(proto_file)
-                print(f"Copied: {proto_file}")
-            except Exception as e:
-                print(f"Error copying {proto_file}: {e}")
+        # Create each destination subdirectory once, rather than once per file
+        dest_dirs = {os.path.dirname(os.path.join(dest_base, proto_file)) for proto_file in proto_files}
+        for dest_dir in dest_dirs:
+            os.makedirs(dest_dir, exist_ok=True)
+        
+        # Copies are independent and I/O bound, so run them concurrently and
+        # report the results in list order once they finish
+        with ThreadPoolExecutor(max_workers=IO_WORKERS) as executor:
+            results = executor.map(lambda proto_file: copy_proto_file(source_base, dest_base, proto_file),
+                                   proto_files)
+            for proto_file, (copied, message) in zip(proto_files, results):
+                print(message)
+                if copied:
+                    copied_files.append(proto_file)
                     
     except Exception as e:
         print(f"Error during organization: {e}")
     
     return copied_files
 
-def run_protoc_protobuf(proto_files: List[str]) -> Optional[CompletedProcess]:
-    # Validate input
-    if not all(proto_file.endswith('.proto') for proto_file in proto_files):
-        print("Error: Invalid proto file detected")
+def sync_generated_files(staging_dir: str, generated_dir: str) -> int:
+    """
+    Move freshly generated files into the generated directory, leaving files whose
+    contents are unchanged untouched so their timestamps don't invalidate build caches.
+    Returns the number of files that were added or changed.
+    """
+    updated = 0
+    created_dirs = set()
+    for entry in iter_files(staging_dir):
+        generated_file = os.path.join(generated_dir, os.path.relpath(entry.path, staging_dir))
+        
+        if os.path.exists(generated_file) and filecmp.cmp(entry.path, generated_file, shallow=False):
+            continue
+        
+        generated_subdir = os.path.dirname(generated_file)
+        if generated_subdir not in created_dirs:
+            os.makedirs(generated_subdir, exist_ok=True)
+            created_dirs.add(generated_subdir)
+        os.replace(entry.path, generated_file)
+        updated += 1
+    return updated
+
+def find_source_proto_files(source_base: str, proto_files: List[str]) -> List[str]:
+    """
+    Return the proto files that exist in the source tree, for generating code
+    straight from it without vendoring copies into Protos.
+    """
+    found_files = []
+    for proto_file in dict.fromkeys(proto_files):
+        source_file = os.path.join(source_base, proto_file)
+        if os.path.exists(source_file):
+            found_files.append(proto_file)
+        else:
+            print(f"Warning: Source file not found: {source_file}")
+    return found_files
+
+def run_protoc(proto_files: List[str], proto_dir: str = "./Protos") -> Optional[CompletedProcess]:
+    """
+    Generate the Swift protobuf and gRPC code in a single protoc invocation,
+    so the protos are only parsed once for both plugins.
+    """
+    # Validate input, naming the first offending file
+    invalid_file = next((proto_file for proto_file in proto_files if not proto_file.endswith('.proto')), None)
+    if invalid_file is not None:
+        print(f"Error: Invalid proto file detected: {invalid_file} is not a .proto file")
         return None
 
     # Create output directory if it doesn't exist
-    os.makedirs(f"./Generated", exist_ok=True)
-        
-    cmd = [
-        "protoc",
-        "--swift_opt=Visibility=Public",
-        "--swift_opt=FileNaming=FullPath",
-        f"--swift_out=./Generated",
-        "--proto_path=./Protos"
-    ] + proto_files  # Remove shlex.quote as it's causing issues with the file paths
+    os.makedirs(GENERATED_DIR, exist_ok=True)
     
-    print(f"\nGenerating Swift protobuf code for {len(proto_files)} files:")
+    print(f"\nGenerating Swift protobuf and gRPC code for {len(proto_files)} files:")
     for file in proto_files:
         print(f"  - {file}")
     
+    # Generate into a hidden staging directory next to Generated (hidden so SwiftPM
+    # never picks it up), then only move over the files whose contents changed
+    with tempfile.TemporaryDirectory(prefix=".Generated.", dir=os.path.dirname(GENERATED_DIR)) as staging_dir:
+        cmd = [
+            "protoc",
+            *PROTOBUF_OPTIONS,
+            f"--swift_out={staging_dir}",
+            *GRPC_OPTIONS,
+            f"--grpc-swift_out={staging_dir}",
+            f"--proto_path={proto_dir}"
+        ] + proto_files  # Remove shlex.quote as it's causing issues with the file paths
+        
+        # protoc's output goes straight to the terminal, so warnings and errors show up
+        # as they happen instead of being buffered until it exits
+        try:
+            result = subprocess.run(cmd, check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"\nError during code generation: {e}")
+            return None
+        
+        updated = sync_generated_files(staging_dir, GENERATED_DIR)
+        print(f"\n{updated} generated file(s) added or changed.")
+        return result
+
+def hash_proto_files(proto_dir: str, proto_files: List[str]) -> Dict[str, str]:
+    """
+    Compute the SHA-256 of each proto file, keyed by its path relative to proto_dir.
+    """
+    def hash_file(proto_file: str) -> str:
+        with open(os.path.join(proto_dir, proto_file), 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    
+    # Each file is hashed independently, and hashlib releases the GIL while digesting
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as executor:
+        return dict(zip(proto_files, executor.map(hash_file, proto_files)))
+
+def tool_version(tool: str) -> str:
+    """
+    Return the output of `<tool> --version`, or "unavailable" if it can't be run.
+    """
     try:
-        return subprocess.run(cmd, check=True, capture_output=True, text=True)
-    except subprocess.CalledProcessError as e:
-        print(f"\nError during protobuf generation: {e}")
-        if e.stderr:
-            print(f"Stderr: {e.stderr}")
-        return None
+        result = subprocess.run([tool, "--version"], stdin=subprocess.DEVNULL,
+                                capture_output=True, text=True, check=True)
+        return (result.stdout + result.stderr).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unavailable"
 
-def run_protoc_grpc(proto_files: List[str]):
-    # Create output directory if it doesn't exist
-    os.makedirs(f"./Generated", exist_ok=True)
+def protoc_options_hash() -> str:
+    """
+    Hash the protoc options together with the protoc and plugin versions, so changing
+    either of them (e.g. upgrading swift-protobuf or grpc-swift) regenerates every file.
+    """
+    versions = [tool_version(tool) for tool in ("protoc", "protoc-gen-swift", "protoc-gen-grpc-swift")]
+    return hashlib.sha256(json.dumps([PROTOBUF_OPTIONS, GRPC_OPTIONS, versions]).encode()).hexdigest()
 
-    cmd = [
-        "protoc",
-        "--grpc-swift_opt=Visibility=Public",
-        f"--grpc-swift_out=./Generated",
-        "--proto_path=./Protos"
-    ] + proto_files  # Remove the quotes here as well
+def load_protoc_cache(options_hash: str) -> Dict[str, str]:
+    """
+    Load the proto hashes recorded by the last successful generation.
+    Returns an empty dict if there is no cache or it was made with other protoc options or versions.
+    """
+    try:
+        with open(PROTOC_CACHE_PATH, 'r') as f:
+            cache = json.load(f)
+        if cache.get("options") != options_hash:
+            return {}
+        return cache.get("files", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+def write_protoc_cache(hashes: Dict[str, str], options_hash: str):
+    try:
+        with open(PROTOC_CACHE_PATH, 'w') as f:
+            json.dump({"options": options_hash, "files": hashes}, f, indent=2, sort_keys=True)
+    except OSError as e:
+        print(f"Warning: Could not write protoc cache: {e}")
+
+def find_proto_imports(proto_dir: str, proto_files: List[str]) -> Dict[str, List[str]]:
+    """
+    Map each proto file to the paths it imports, relative to proto_dir.
+    """
+    def read_imports(proto_file: str) -> List[str]:
+        with open(os.path.join(proto_dir, proto_file), 'r') as f:
+            return PROTO_IMPORT_PATTERN.findall(f.read())
     
-    print(f"\nGenerating gRPC code for {len(proto_files)} files:")
-    for file in proto_files:
-        print(f"  - {file}")
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as executor:
+        return dict(zip(proto_files, executor.map(read_imports, proto_files)))
+
+def find_stale_proto_files(proto_files: List[str], hashes: Dict[str, str], cached: Dict[str, str],
+                           imports: Dict[str, List[str]]) -> List[str]:
+    """
+    Return the proto files whose contents changed since the last generation,
+    or whose generated Swift file is missing, along with every proto that
+    imports one of them directly or transitively.
+    """
+    stale = set()
+    for proto_file in proto_files:
+        generated_file = os.path.join(GENERATED_DIR, proto_file[:-len(".proto")] + ".pb.swift")
+        if cached.get(proto_file) != hashes[proto_file] or not os.path.exists(generated_file):
+            stale.add(proto_file)
     
-    try:
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        print("\ngRPC services generated successfully.")
-        return result
-    except subprocess.CalledProcessError as e:
-        print(f"\nError during gRPC generation: {e}")
-        if e.stderr:
-            print(f"Stderr: {e.stderr}")
-        return None
+    # Walk the import graph backwards from the changed protos
+    importers: Dict[str, List[str]] = {}
+    for proto_file, imported_files in imports.items():
+        for imported_file in imported_files:
+            importers.setdefault(imported_file, []).append(proto_file)
+    
+    pending = list(stale)
+    while pending:
+        for importer in importers.get(pending.pop(), []):
+            if importer not in stale:
+                stale.add(importer)
+                pending.append(importer)
+    
+    return [proto_file for proto_file in proto_files if proto_file in stale]
 
 def update_ci_hiero_version(version: str, ci_file_path: str = "../../.github/workflows/swift-ci.yml"):
     """
@@ -130,24 +317,24 @@ def update_ci_hiero_version(version: str, ci_file_path: str = "../../.github/wor
     """
     try:
         # Read the current file contents
-        with open(ci_file_path, 'r') as f:
-            content = f.read()
+        ci_file = Path(ci_file_path)
+        content = ci_file.read_text()
         
-        # Pattern to match hieroVersion: vX.X.X
-        pattern = r'(hieroVersion:\s*)v[\d.]+'
-        replacement = f'\\1{version}'
+        # Replace the version, counting matches in the same pass
+        new_content, replacements = HIERO_VERSION_PATTERN.subn(rf'\g<1>{version}', content)
         
         # Check if the pattern exists
-        if not re.search(pattern, content):
+        if not replacements:
             print(f"Warning: Could not find hieroVersion in {ci_file_path}")
             return False
         
-        # Replace the version
-        new_content = re.sub(pattern, replacement, content)
+        # Leave the file untouched if it already has this version
+        if new_content == content:
+            print(f"\nhieroVersion is already {version} in {ci_file_path}")
+            return True
         
         # Write the updated content back
-        with open(ci_file_path, 'w') as f:
-            f.write(new_content)
+        ci_file.write_text(new_content)
         
         print(f"\nUpdated hieroVersion to {version} in {ci_file_path}")
         return True
@@ -163,6 +350,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Update proto files and generate Swift code.')
     parser.add_argument('--version', '-v', type=str, required=True,
                         help='The Hiero version to use (e.g., v0.69.0). This will also update the hieroVersion in the CI workflow.')
+    parser.add_argument('--force', action='store_true',
+                        help='Regenerate every proto, ignoring the cache of previously generated files.')
+    parser.add_argument('--no-vendor', action='store_true',
+                        help='Generate code directly from the protobufs submodule without copying the protos into Protos.')
     args = parser.parse_args()
     
     hiero_version = args.version
@@ -171,161 +362,30 @@ if __name__ == "__main__":
     SOURCE_DIR = "../../protobufs/hapi/hedera-protobuf-java-api/src/main/proto"
     DEST_DIR = "Protos"
     
-    files_to_generate = [
-        "services/address_book_service.proto",
-        "services/basic_types.proto",
-        "services/consensus_create_topic.proto",
-        "services/consensus_delete_topic.proto",
-        "services/consensus_get_topic_info.proto",
-        "services/consensus_service.proto",
-        "services/consensus_submit_message.proto",
-        "services/consensus_topic_info.proto",
-        "services/consensus_update_topic.proto",
-        "services/contract_call_local.proto",
-        "services/contract_call.proto",
-        "services/contract_create.proto",
-        "services/contract_delete.proto",
-        "services/contract_get_bytecode.proto",
-        "services/contract_get_info.proto",
-        "services/contract_get_records.proto",
-        "services/contract_types.proto",
-        "services/contract_update.proto",
-        "services/crypto_add_live_hash.proto",
-        "services/crypto_approve_allowance.proto",
-        "services/crypto_create.proto",
-        "services/crypto_delete_allowance.proto",
-        "services/crypto_delete_live_hash.proto",
-        "services/crypto_delete.proto",
-        "services/crypto_get_account_balance.proto",
-        "services/crypto_get_account_records.proto",
-        "services/crypto_get_info.proto",
-        "services/crypto_get_live_hash.proto",
-        "services/crypto_get_stakers.proto",
-        "services/crypto_service.proto",
-        "services/crypto_transfer.proto",
-        "services/crypto_update.proto",
-        "services/custom_fees.proto",
-        "services/duration.proto",
-        "services/ethereum_transaction.proto",
-        "services/exchange_rate.proto",
-        "services/file_append.proto",
-        "services/file_create.proto",
-        "services/file_delete.proto",
-        "services/file_get_contents.proto",
-        "services/file_get_info.proto",
-        "services/file_service.proto",
-        "services/file_update.proto",
-        "services/freeze_service.proto",
-        "services/freeze_type.proto",
-        "services/freeze.proto",
-        "services/get_account_details.proto",
-        "services/get_by_key.proto",
-        "services/get_by_solidity_id.proto",
-        "services/hook_dispatch.proto",
-        "services/hook_store.proto",
-        "services/hook_types.proto",
-        "services/registered_node_create.proto",
-        "services/registered_node_update.proto",
-        "services/registered_node_delete.proto",
-        "services/registered_service_endpoint.proto",
-        "services/network_get_execution_time.proto",
-        "services/network_get_version_info.proto",
-        "services/network_service.proto",
-        "services/node_create.proto",
-        "services/node_delete.proto",
-        "services/node_stake_update.proto",
-        "services/node_update.proto",
-        "services/query_header.proto",
-        "services/query.proto",
-        "services/response_code.proto",
-        "services/response_header.proto",
-        "services/response.proto",
-        "services/schedulable_transaction_body.proto",
-        "services/schedule_create.proto",
-        "services/schedule_delete.proto",
-        "services/schedule_get_info.proto",
-        "services/schedule_service.proto",
-        "services/schedule_sign.proto",
-        "services/smart_contract_service.proto",
-        "services/system_delete.proto",
-        "services/system_undelete.proto",
-        "services/throttle_definitions.proto",
-        "services/timestamp.proto",
-        "services/token_airdrop.proto",
-        "services/token_associate.proto",
-        "services/token_burn.proto",
-        "services/token_cancel_airdrop.proto",
-        "services/token_claim_airdrop.proto",
-        "services/token_create.proto",
-        "services/token_delete.proto",
-        "services/token_dissociate.proto",
-        "services/token_fee_schedule_update.proto",
-        "services/token_freeze_account.proto",
-        "services/token_get_account_nft_infos.proto",
-        "services/token_get_info.proto",
-        "services/token_get_nft_info.proto",
-        "services/token_get_nft_infos.proto",
-        "services/token_grant_kyc.proto",
-        "services/token_mint.proto",
-        "services/token_pause.proto",
-        "services/token_reject.proto",
-        "services/token_revoke_kyc.proto",
-        "services/token_service.proto",
-        "services/token_unfreeze_account.proto",
-        "services/token_unpause.proto",
-        "services/token_update_nfts.proto",
-        "services/token_update.proto",
-        "services/token_wipe_account.proto",
-        "services/transaction_contents.proto",
-        "services/transaction_get_fast_record.proto",
-        "services/transaction_get_receipt.proto",
-        "services/transaction_get_record.proto",
-        "services/transaction_receipt.proto",
-        "services/transaction_record.proto",
-        "services/transaction_response.proto",
-        "services/transaction.proto",
-        "services/unchecked_submit.proto",
-        "services/util_prng.proto",
-        "services/util_service.proto",
-
-        "sdk/transaction_list.proto",
-
-        # Auxiliary files
-        "services/auxiliary/blockrecords/migration_root_hash_vote.proto",
-        "services/auxiliary/history/history_proof_signature.proto",
-        "services/auxiliary/history/history_proof_key_publication.proto",
-        "services/auxiliary/history/history_proof_vote.proto",
-        "services/auxiliary/tss/tss_message.proto",
-        "services/auxiliary/tss/tss_vote.proto",
-        "services/auxiliary/tss/ledger_id_publication.proto",
-        "services/auxiliary/hints/hints_preprocessing_vote.proto",
-        "services/auxiliary/hints/hints_partial_signature.proto",
-        "services/auxiliary/hints/crs_publication.proto",
-        "services/auxiliary/hints/hints_key_publication.proto",
-        "services/state/hints/hints_types.proto",
-        "services/state/history/history_types.proto",
-        
-        "platform/event/state_signature_transaction.proto",
-        "block/stream/chain_of_trust_proof.proto",
-
-        "mirror/mirror_network_service.proto",
-
-        "block/stream/chain_of_trust_proof.proto"
-    ]
+    files_to_generate = load_proto_manifest(PROTOS_MANIFEST_PATH)
     
-    successfully_copied = organize_proto_files(SOURCE_DIR, DEST_DIR, files_to_generate)
+    if args.no_vendor:
+        proto_dir = SOURCE_DIR
+        successfully_copied = find_source_proto_files(SOURCE_DIR, files_to_generate)
+    else:
+        proto_dir = DEST_DIR
+        successfully_copied = organize_proto_files(SOURCE_DIR, DEST_DIR, files_to_generate)
     
     if successfully_copied:
-        # Generate protobuf code
-        services_result = run_protoc_protobuf(successfully_copied)
+        # Only regenerate protos that changed since the last successful run
+        proto_hashes = hash_proto_files(proto_dir, successfully_copied)
+        proto_imports = find_proto_imports(proto_dir, successfully_copied)
+        options_hash = protoc_options_hash()
+        cached_hashes = {} if args.force else load_protoc_cache(options_hash)
+        stale_files = find_stale_proto_files(successfully_copied, proto_hashes, cached_hashes,
+                                             proto_imports)
         
-        if services_result:
-            print("\nProtobufs generated successfully.")
+        if stale_files:
+            if run_protoc(stale_files, proto_dir):
+                print("\nProtobufs and gRPC services generated successfully.")
+                write_protoc_cache(proto_hashes, options_hash)
         else:
-            print("\nNo files were copied successfully. Cannot generate code.")
-        
-        # Generate gRPC code
-        run_protoc_grpc(successfully_copied)
+            print("\nGenerated code is up to date with the proto files. Skipping protoc.")
         
         # Update the CI workflow with the new Hiero version
         update_ci_hiero_version(hiero_version)